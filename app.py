@@ -1,69 +1,46 @@
+import hashlib
+import logging
 import os
-from dotenv import load_dotenv
+import time
 import streamlit as st
-from google import genai
-import re
-
-
-def contains_chinese(text: str) -> bool:
-    if not text:
-        return False
-    return bool(re.search(r'[\u4e00-\u9fff]', text))
-# Load environment variables
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+from workpolish.cache import ResponseCache
+from workpolish.parser import (
+    RESPONSE_SCHEMA,
+    normalize,
+    parse_structured,
+    parse_text,
+)
+from workpolish.prompt_builder import CONTEXTS, EMAIL_CONTEXTS, build_prompt, build_structure_prompt, contains_chinese
+from workpolish.style import load_css
 
-# Initialize client
-client = genai.Client(api_key=API_KEY) if API_KEY else genai.Client()
+logger = logging.getLogger("workpolish")
 
-st.set_page_config(page_title="WorkPolish (Gemini)", layout="centered")
-st.markdown("""
-<style>
-body, .stApp {
-    background-color: #ffffff !important;
-    color: #000000 !important;
-}
 
-/* Text area styling */
-textarea, .stTextArea textarea {
-    background-color: #f8f8f8 !important;
-    color: #000000 !important;
-    border-radius: 8px !important;
-    border: 1px solid #cccccc !important;
-    font-size: 16px !important;
-    caret-color: #000000 !important;
-}
-
-/* General text */
-div[data-testid="stMarkdownContainer"] p {
-    color: #000000 !important;
-}
+@st.cache_resource(show_spinner=False)
+def _get_client():
+    """
+    Create the Gemini client on first use and share it across reruns.
+    google.genai (and dotenv) are imported here so the first page render
+    doesn't wait for them.
+    """
+    from dotenv import load_dotenv
+    from google import genai
 
-/* Buttons (Polish + Download) */
-div.stButton button, div[data-testid="stDownloadButton"] button {
-    background-color: #007bff !important;
-    color: #ffffff !important;
-    border-radius: 8px !important;
-    border: none !important;
-    padding: 0.6em 1.2em !important;
-    font-weight: 600 !important;
-    font-size: 16px !important;
-    box-shadow: 0 2px 4px rgba(0, 0, 0, 0.15) !important;
-    transition: all 0.2s ease-in-out;
-}
+    # Load environment variables
+    load_dotenv()
+    api_key = os.getenv("GEMINI_API_KEY")
+    return genai.Client(api_key=api_key) if api_key else genai.Client()
 
-div.stButton button:hover, div[data-testid="stDownloadButton"] button:hover {
-    background-color: #0056b3 !important;
-    transform: translateY(-1px);
+# ---- selectbox options ----
+_TONES: tuple[str, ...] = ("More formal", "More concise", "More polite", "More persuasive", "More casual")
+_MODEL_OPTIONS = {
+    "Gemini Flash": "gemini-2.5-flash",
+    "Gemini Pro": "gemini-2.5-pro",
 }
+_MODEL_NAMES: tuple[str, ...] = tuple(_MODEL_OPTIONS)
 
-/* Make buttons look distinct but aligned */
-div[data-testid="stDownloadButton"] button::before {
-    content: "⬇️ ";
-}
-</style>
-""", unsafe_allow_html=True)
+st.set_page_config(page_title="WorkPolish (Gemini)", layout="centered")
+st.markdown(load_css(), unsafe_allow_html=True)
 
 # ---- header ----
 st.title("✨ WorkPolish — AI Workplace Writing Assistant (Gemini)")
@@ -72,133 +49,145 @@ st.write("Polish your professional emails, chat messages, and slides. Choose ton
 # ---- UI components ----
 if "history" not in st.session_state:
     st.session_state.history = []
-user_text = st.text_area("Enter text to polish:", height=200, placeholder="Type or paste your text here...")
-if contains_chinese(user_text):
-    st.info("Detected Chinese input — the app will translate to English and then polish the English output.")
-recent_input = st.selectbox(
-    "Or select from recent inputs:",
-    [""] + st.session_state.history,
-    index=0
-)
 
-# 如果用户选了历史文本，覆盖输入框内容
-if recent_input:
-    user_text = recent_input
-
-tone = st.selectbox("Target tone", ["More formal", "More concise", "More polite", "More persuasive", "More casual"])
-context = st.selectbox("Context", [
-    "Email to manager",
-    "Message to manager",
-    "Message to teammate",
-    "Email to online seller (e.g. Amazon)",
-    "PPT text",
-    "Chat message"
-])
-
-# ---- Model selection: Flash vs Pro ----
-model_options = {
-    "Gemini Flash": "gemini-2.5-flash",
-    "Gemini Pro": "gemini-2.5-pro"
-}
-selected_model_name = st.selectbox("Select AI Model", list(model_options.keys()), index=0)
-MODEL = model_options[selected_model_name]
+# widgets inside the form only send their values on "Polish", so editing
+# text or changing tone/context/model doesn't rerun the script each time
+with st.form("polish"):
+    user_text = st.text_area("Enter text to polish:", height=200, placeholder="Type or paste your text here...")
+    recent_input = st.selectbox(
+        "Or select from recent inputs:",
+        [""] + st.session_state.history,
+        index=0
+    )
+
+    # 如果用户选了历史文本，覆盖输入框内容
+    if recent_input:
+        user_text = recent_input
+
+    tone = st.selectbox("Target tone", _TONES, key="tone")
+    context = st.selectbox("Context", CONTEXTS, key="context")
+
+    # ---- Model selection: Flash vs Pro ----
+    selected_model_name = st.selectbox("Select AI Model", _MODEL_NAMES, index=0, key="model")
+    MODEL = _MODEL_OPTIONS[selected_model_name]
 
-show_notes = st.checkbox("Show edit notes (2-3 bullets)", value=True)
+    show_notes = st.checkbox("Show edit notes (2-3 bullets)", value=True)
 
-def build_prompt(text: str, tone: str, context: str, show_notes: bool, translate_to_english: bool=False) -> str:
+    submitted = st.form_submit_button("Polish ✨")
+
+CACHE_TTL = 3600  # seconds a finished response is reused
+CACHE_MAX_ENTRIES = 256  # finished responses kept per process (least recently used dropped)
+STRUCTURE_MODEL = "gemini-2.5-flash-lite"  # cheap model for the stage-2 JSON reformat
+STREAM_REFRESH = 0.05  # seconds between live preview repaints while streaming
+POLISH_TEMPERATURE = 0.3
+MAX_OUTPUT_TOKENS = 400  # polished text only
+MAX_OUTPUT_TOKENS_NOTES = 900  # polished text + subject/edit notes
+# 2.5 models count thinking against max_output_tokens; thinking is left at the
+# model's default and this much room is added to the cap for it
+THINKING_ALLOWANCE = 2048
+
+@st.cache_resource(show_spinner=False)
+def _response_cache() -> ResponseCache:
     """
-    If translate_to_english is True, instruct the model to first translate from Chinese to English,
-    then polish the English result to the requested tone/context.
+    Finished Gemini outputs shared across sessions, keyed on the request digest.
     """
-    translation_instruction = ""
-    if translate_to_english:
-        translation_instruction = (
-            "First translate the input (Chinese) into clear, natural English. "
-            "Then polish the translated English to match the requested tone and context. "
-        )
-    prompt = (
-        "You are a professional workplace writing assistant. "
-        f"{translation_instruction}"
-        "Polish the text for clarity, tone, and conciseness while keeping the original meaning strictly unchanged.\n\n"
-        f"- Target tone: {tone}\n"
-        f"- Context: {context}\n"
-        "- Respond in English.\n"
-        "- Do not invent new facts or add content not present in the original text.\n\n"
-        "Original:\n\"\"\"\n" + text + "\n\"\"\"\n\n"
-    )
-    # If email-like, ask for subject in English too
-    if "Email" in context:
-        prompt += (
-            "Also produce a short email subject line (<= 8 words) prefixed by 'Subject:'.\n"
-            "Then provide the polished email body in English.\n\n"
-        )
-    if show_notes:
-        prompt += "Output format:\n1) Polished text (in English)\n2) 2-3 short bullet points describing key edits\n"
-    else:
-        prompt += "Output format: Polished text only.\n"
-    return prompt
+    return ResponseCache(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+
+def _response_text(response) -> str:
+    """
+    Robustly extract text from various response shapes.
+    response.text covers the normal case; other shapes are only probed when it is empty.
+    """
+    return (getattr(response, "text", None) or _fallback_text(response)).strip()
+
+def _fallback_text(response) -> str:
+    if output := getattr(response, "output", None):
+        try:
+            return output[0].content[0].text or ""
+        except Exception:
+            return str(output)
+    if candidates := getattr(response, "candidates", None):
+        try:
+            return candidates[0].content[0].text or ""
+        except Exception:
+            return str(candidates)
+    return str(response)
 
-def parse_polished_and_notes(raw: str):
+def _polish_config(text: str, with_notes: bool, translate: bool) -> dict:
     """
-    Try to split model output into polished_text and edit_notes.
-    Returns (polished_text, notes_list).
-    If not parseable, returns (raw, []).
+    Generation config for stage 1: low temperature and an output cap sized to the job.
+    The cap grows with the input so long texts aren't cut off: ~4 chars per token for
+    English, but each Chinese character turns into ~2 tokens of English when translating.
     """
-    text = (raw or "").strip()
-
-    # Try common "1) ... 2) ..." pattern
-    m = re.search(r"(?:\n|^)\s*1[\)\.]([\s\S]*?)(?:\n\s*2[\)\.])([\s\S]*)", "\n" + text)
-    if m:
-        polished = m.group(1).strip()
-        notes_raw = m.group(2).strip()
-        notes = [re.sub(r"^\s*[-\d\.\)]+\s*", "", s).strip() for s in re.split(r"\n+", notes_raw) if s.strip()]
-        return polished, notes
-
-    # Try headings like "Polished text:" then notes
-    m2 = re.search(r"Polished text[:\-]?\s*(.*?)\s*(?:\n+Edit notes[:\-]?|\n+Key edits[:\-]?|\n+2[\)\.])([\s\S]*)", text, flags=re.I|re.S)
-    if m2:
-        polished = m2.group(1).strip()
-        notes_raw = m2.group(2).strip()
-        notes = [s.strip() for s in re.split(r"[\n\r]+", notes_raw) if s.strip()]
-        return polished, notes
-
-    # Fallback: split by "2)"
-    parts = re.split(r"\n\s*2[\)\.]\s*", text, maxsplit=1)
-    if len(parts) == 2:
-        first = re.sub(r"^\s*1[\)\.]\s*", "", parts[0]).strip()
-        notes = [s.strip() for s in re.split(r"[\n\r]+", parts[1]) if s.strip()]
-        return first, notes
-
-    # Nothing matched => return raw as polished_text
-    return text, []
-
-def extract_subject(raw: str):
+    base = MAX_OUTPUT_TOKENS_NOTES if with_notes else MAX_OUTPUT_TOKENS
+    cjk = sum(1 for ch in text if "\u4e00" <= ch <= "\u9fff") if translate else 0
+    return {
+        "temperature": POLISH_TEMPERATURE,
+        "max_output_tokens": base + 2 * cjk + (len(text) - cjk) // 4 + THINKING_ALLOWANCE,
+    }
+
+def _stop_reason(response) -> str:
     """
-    Extract a 'Subject:' line if present (case-insensitive).
-    Returns (subject_or_None, remaining_text).
+    Why the response (or stream chunk) ended: the prompt's block_reason if it was
+    blocked, otherwise the candidate's finish_reason (e.g. "STOP", "MAX_TOKENS",
+    "SAFETY"); "" if neither is set.
     """
-    if not raw:
-        return None, raw
-    # 1) look for explicit 'Subject:' line
-    m = re.search(r"(?im)^(?:Subject|Subject Line)\s*[:\-]\s*(.+)$", raw, flags=re.M)
-    if m:
-        subject = m.group(1).strip().strip('"')
-        # remove only the first Subject line from the raw output
-        start, end = m.span()
-        remaining = (raw[:start] + raw[end:]).strip()
-        return subject, remaining
-
-    # 2) heuristic: if first line is short (<=8 words) and followed by blank line, treat as subject
-    lines = raw.strip().splitlines()
-    if len(lines) > 1 and len(lines[0].split()) <= 8 and lines[1].strip() == "":
-        subject = lines[0].strip().strip('"')
-        remaining = "\n".join(lines[2:]).strip()
-        return subject, remaining
-
-    return None, raw
+    feedback = getattr(response, "prompt_feedback", None)
+    reason = getattr(feedback, "block_reason", None)
+    if reason is None:
+        try:
+            reason = response.candidates[0].finish_reason
+        except Exception:
+            reason = None
+    if reason is None:
+        return ""
+    return getattr(reason, "name", None) or str(reason)
+
+def _stream_polish(model: str, prompt: str, config: dict, placeholder) -> tuple[str, str]:
+    """
+    Stage 1: stream Gemini's output into placeholder as it arrives.
+    Returns (full raw output text, stop reason) once the stream ends; see _stop_reason.
+    """
+    models = _get_client().models
+    if not hasattr(models, "generate_content_stream"):
+        # older google-genai without streaming -> one blocking call
+        response = models.generate_content(model=model, contents=prompt, config=config)
+        return _response_text(response), _stop_reason(response)
+
+    buf = []
+    last_paint = 0.0
+    reason = ""
+    for chunk in models.generate_content_stream(model=model, contents=prompt, config=config):
+        buf.append(chunk.text or "")
+        # the finish/block reason arrives on the last chunk (or the only one, if blocked)
+        reason = _stop_reason(chunk) or reason
+        # repaint at most every STREAM_REFRESH seconds; small chunks arrive much faster
+        now = time.monotonic()
+        if now - last_paint >= STREAM_REFRESH:
+            placeholder.markdown("".join(buf) + "▌")
+            last_paint = now
+    return "".join(buf).strip(), reason
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def _structure(raw_output: str) -> str:
+    """
+    Stage 2: have a small model reformat the stage-1 output as RESPONSE_SCHEMA JSON.
+    Returns the JSON text; cached on the stage-1 output.
+    """
+    config = {"response_mime_type": "application/json", "response_schema": RESPONSE_SCHEMA}
+    response = _get_client().models.generate_content(
+        model=STRUCTURE_MODEL, contents=build_structure_prompt(raw_output), config=config
+    )
+    return response.text or ""
 
 # ---- action ----
-if st.button("Polish ✨"):
+if st.button("Clear cache", help="Forget cached results and ask Gemini again"):
+    _response_cache().clear()
+    _structure.clear()  # stage-2 JSON is cached separately, on the stage-1 text
+    st.session_state.pop("last_key", None)
+    st.session_state.pop("last_raw", None)
+
+if submitted:
     if not user_text.strip():
         st.warning("Please enter some text to polish.")
     else:
@@ -209,114 +198,100 @@ if st.button("Polish ✨"):
             st.info("Calling Gemini...")
         # detect if user input contains Chinese
         need_translate = contains_chinese(user_text)
+        if need_translate:
+            st.info("Detected Chinese input — the app will translate to English and then polish the English output.")
+        is_email = context in EMAIL_CONTEXTS
 
         # build prompt with translation instruction when needed
         prompt = build_prompt(user_text, tone, context, show_notes, translate_to_english=need_translate)
+        # one slot for the whole result panel: the stream renders into it first,
+        # then the final subject/text/notes replace it in place
+        result_slot = st.empty()
+        stop_reason = ""
+        cut_off = False
         try:
-            # call the model
-            response = client.models.generate_content(model=MODEL, contents=prompt)
-
-            # robustly extract text from various response shapes
-            raw_output = ""
-            if hasattr(response, "text") and response.text:
-                raw_output = response.text
-            elif hasattr(response, "output") and isinstance(response.output, list) and len(response.output) > 0:
-                try:
-                    raw_output = response.output[0].content[0].text
-                except Exception:
-                    raw_output = str(response.output)
-            elif hasattr(response, "candidates") and isinstance(response.candidates, list) and len(response.candidates) > 0:
-                try:
-                    raw_output = response.candidates[0].content[0].text
-                except Exception:
-                    raw_output = str(response.candidates)
+            # digest of model + prompt (which covers text, tone, context and options);
+            # small fixed-size cache key instead of the full prompt string
+            request_key = hashlib.blake2b((MODEL + "\x00" + prompt).encode(), digest_size=16).hexdigest()
+            # same request as this session's last one -> reuse its output as-is
+            if st.session_state.get("last_key") == request_key and "last_raw" in st.session_state:
+                raw_output = st.session_state["last_raw"]
             else:
-                raw_output = str(response)
-
-            raw_output = (raw_output or "").strip()
-
-            # If email context, extract subject
-            subject = None
-            remaining = raw_output
-            if "Email" in context and raw_output:
-                subject, remaining = extract_subject(raw_output)
-
-            # Parse polished text and notes from remaining text
-            polished_text, notes = parse_polished_and_notes(remaining)
-
-            # ---------- CLEANUP: ensure notes are not part of polished_text ----------
-            # If polished_text likely still contains notes, split it off at common separators.
-            # Split at '2)', '2.', 'Edit notes', 'Key edits', or a line that starts with '-' or '*'
-            split_re = re.compile(r"(\n\s*2[\)\.]|\n\s*Edit notes[:\-]?|\n\s*Key edits[:\-]?|\n\s*(?:-|\*)(?:\s|$))", flags=re.I)
-            parts = split_re.split(polished_text or "")
-            if parts and len(parts) > 0:
-                # parts[0] is the text before any recognized note marker
-                polished_before = parts[0].strip()
-                if polished_before:
-                    polished_text = polished_before
-
-                # if notes empty, try to capture the trailing part as notes
-                if (not notes or len(notes) == 0) and len(parts) > 1:
-                    trailing = "".join(parts[1:]).strip()
-                    # split trailing by lines and clean bullet markers
-                    candidate_notes = [re.sub(r"^\s*[-\*\d\.\)\(]+\s*", "", s).strip()
-                                       for s in re.split(r"[\n\r]+", trailing) if s.strip()]
-                    if candidate_notes:
-                        notes = candidate_notes
-
-            # Fallbacks if polished_text empty
-            if not polished_text or polished_text.strip() == "":
-                # prefer the 'remaining' chunk (which is raw_output without subject)
-                if remaining and remaining.strip():
-                    # remove potential trailing notes from remaining as above
-                    rem_parts = split_re.split(remaining)
-                    polished_text = rem_parts[0].strip() if rem_parts else remaining.strip()
-                    # and set notes from trailing if empty
-                    if (not notes or len(notes) == 0) and len(rem_parts) > 1:
-                        trailing = "".join(rem_parts[1:]).strip()
-                        notes = [re.sub(r"^\s*[-\*\d\.\)\(]+\s*", "", s).strip()
-                                 for s in re.split(r"[\n\r]+", trailing) if s.strip()]
-                elif raw_output:
-                    # last resort: take raw_output but strip notes
-                    raw_parts = split_re.split(raw_output)
-                    polished_text = raw_parts[0].strip() if raw_parts else raw_output.strip()
-                    if (not notes or len(notes) == 0) and len(raw_parts) > 1:
-                        trailing = "".join(raw_parts[1:]).strip()
-                        notes = [re.sub(r"^\s*[-\*\d\.\)\(]+\s*", "", s).strip()
-                                 for s in re.split(r"[\n\r]+", trailing) if s.strip()]
-                else:
-                    polished_text = str(response).strip()
-
-            # Clean final polished_text
-            cleaned = (polished_text or "").strip().strip('"')
-
-            # ---- display Subject if present ----
-            if subject:
-                st.subheader("✉️ Subject")
-                st.markdown(f"**{subject}**")
-
-            # ---- display polished email/text (no label inside text_area) ----
-            st.subheader("✅ Polished result")
-            st.text_area(label="", value=cleaned, height=200, max_chars=None, key="polished_text")
-
-            # ---- display edit notes if requested ----
-            if show_notes:
-                st.subheader("✏️ Edit notes")
-                if notes:
-                    for n in notes:
-                        st.markdown(f"- {n}")
+                # reuse a recent result for the same request from any session, otherwise stream it
+                cache = _response_cache()
+                raw_output = cache.get(request_key)
+                if raw_output is None:
+                    # subject or notes make the answer longer -> larger output cap
+                    config = _polish_config(user_text, show_notes or is_email, need_translate)
+                    raw_output, stop_reason = _stream_polish(MODEL, prompt, config, result_slot)
+                    cut_off = stop_reason == "MAX_TOKENS"
+                    if raw_output and not cut_off:
+                        cache.put(request_key, raw_output)
+                # empty (blocked/no text) or cut-off output isn't remembered, so the next click retries
+                if raw_output and not cut_off:
+                    st.session_state["last_key"] = request_key
+                    st.session_state["last_raw"] = raw_output
+
+            if not raw_output:
+                # blocked prompt or a stream without text: say why instead of an empty result
+                result_slot.warning(
+                    f"Gemini returned no text (reason: {stop_reason or 'unknown'}). "
+                    "Try rephrasing the text, or click Polish again."
+                )
+            else:
+                structured = None
+                if not show_notes and not is_email:
+                    # polished text only -> nothing to split apart
+                    structured = (None, raw_output, [])
                 else:
-                    # if still no parsed notes but raw_output contains extra info, show a short fallback
-                    if raw_output and raw_output != cleaned:
-                        st.write("Notes / Raw output:")
-                        st.write(raw_output)
-                    else:
-                        st.write("No structured notes parsed.")
-
-            # ---- download button ----
-            st.download_button("Download result (.txt)", data=cleaned, file_name="polished_text.txt", mime="text/plain", key="download_result")
+                    try:
+                        structured = parse_structured(_structure(raw_output))
+                    except Exception:
+                        logger.warning("Stage-2 structuring failed; using text parsers", exc_info=True)
+                from_json = structured is not None
+                if not from_json:
+                    # Stage 2 failed or returned bad JSON -> fall back to the text parsers
+                    structured = parse_text(raw_output, is_email)
+                subject, polished_text, notes = structured
+                if not is_email:
+                    # only emails get a subject, even if stage 2 came up with one
+                    subject = None
+
+                # Clean final polished_text
+                cleaned = normalize(polished_text or "")
+
+                with result_slot.container():
+                    if cut_off:
+                        st.warning("The response hit the length limit and was cut off. "
+                                   "It wasn't cached; try a shorter text or split it into parts.")
+                    # ---- display Subject if present ----
+                    if subject:
+                        st.subheader("✉️ Subject")
+                        st.markdown(f"**{subject}**")
+
+                    # ---- display polished email/text (no label inside text_area) ----
+                    st.subheader("✅ Polished result")
+                    st.text_area(label="", value=cleaned, height=200, max_chars=None, key="polished_text")
+
+                    # ---- display edit notes if requested ----
+                    if show_notes:
+                        st.subheader("✏️ Edit notes")
+                        if notes:
+                            # one markdown element for the whole list rather than one per bullet
+                            st.markdown("\n".join(f"- {n}" for n in notes))
+                        else:
+                            # if still no parsed notes but raw_output contains extra info, show a short fallback
+                            if not from_json and raw_output and raw_output != cleaned:
+                                st.write("Notes / Raw output:")
+                                st.write(raw_output)
+                            else:
+                                st.write("No structured notes parsed.")
+
+                    # ---- download button ----
+                    st.download_button("Download result (.txt)", data=cleaned, file_name="polished_text.txt", mime="text/plain", key="download_result")
 
         except Exception as e:
+            # log the traceback server-side instead of re-raising into a second error box
+            logger.exception("Polish request failed")
             st.error(f"API call failed: {e}")
             st.write("If this persists, please run `pip install --upgrade google-genai` and restart the app.")
-            raise
\ No newline at end of file
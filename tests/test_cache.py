@@ -0,0 +1,38 @@
+"""
+Tests for workpolish.cache.ResponseCache.
+"""
+from workpolish import cache as cache_module
+from workpolish.cache import ResponseCache
+
+
+def test_get_missing_returns_none():
+    assert ResponseCache().get("nope") is None
+
+
+def test_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"  # "a" is now the most recently used
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    cache = ResponseCache(ttl=60)
+    cache.put("a", "A")
+    now[0] += 59
+    assert cache.get("a") == "A"
+    now[0] += 1
+    assert cache.get("a") is None
+
+
+def test_clear():
+    cache = ResponseCache()
+    cache.put("a", "A")
+    cache.clear()
+    assert cache.get("a") is None
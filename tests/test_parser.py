@@ -0,0 +1,167 @@
+"""
+Tests for workpolish.parser: the text fallbacks must split model output the
+same way the original inline regex parser did, and stay linear on long or
+pathological output.
+"""
+import time
+
+import pytest
+
+from workpolish.parser import (
+    extract_subject,
+    normalize,
+    note_lines,
+    parse_polished_and_notes,
+    parse_structured,
+    parse_text,
+    split_notes,
+)
+
+# (raw model output, is_email) -> (subject, polished, notes) as produced by the
+# original parser in app.py. The one intended difference: note_lines also strips
+# bullet markers after "Edit notes:" headings (the original kept "- shorter").
+SAMPLES = [
+    pytest.param(
+        "1) Hi team, the report is ready.\n2) - tightened wording\n- softer tone", False,
+        (None, "Hi team, the report is ready.", ("tightened wording", "softer tone")),
+        id="numbered",
+    ),
+    pytest.param(
+        "1. Hi team, the report is ready.\n2. Made it concise\n3. Fixed grammar", False,
+        (None, "Hi team, the report is ready.", ("Made it concise", "Fixed grammar")),
+        id="numbered-dot",
+    ),
+    pytest.param(
+        "  1) Hi team,\n  please review.\n  2) - shorter\n  - politer", False,
+        (None, "Hi team,\n  please review.", ("shorter", "politer")),
+        id="indented-markers",
+    ),
+    pytest.param(
+        "1) Hi.\r\n2) - a\r\n- b", False,
+        (None, "Hi.", ("a", "b")),
+        id="crlf",
+    ),
+    pytest.param(
+        "Call me at 1) noon.\n2) note", False,
+        (None, "Call me at 1) noon.", ("note",)),
+        id="marker-mid-line",
+    ),
+    pytest.param(
+        "Polished text: Hi team, the report is ready.\n\nEdit notes:\n- shorter\n- politer", False,
+        (None, "Hi team, the report is ready.", ("shorter", "politer")),
+        id="edit-notes-heading",
+    ),
+    pytest.param(
+        "Polished text:\nHi team.\nKey edits:\nshorter\npoliter", False,
+        (None, "Hi team.", ("shorter", "politer")),
+        id="key-edits-heading",
+    ),
+    pytest.param(
+        "Body text\n  Edit notes:\n2) x", False,
+        (None, "Body text", ("x",)),
+        id="heading-before-marker",
+    ),
+    pytest.param(
+        "Hi team, the report is ready.\n- shorter\n* politer", False,
+        (None, "Hi team, the report is ready.", ("shorter", "politer")),
+        id="bare-bullets",
+    ),
+    pytest.param(
+        "Subject: Report ready\n\n1) Dear Anna, the report is ready.\n2) - added greeting", True,
+        ("Report ready", "Dear Anna, the report is ready.", ("added greeting",)),
+        id="subject",
+    ),
+    pytest.param(
+        "Subject: Report ready\n\n1) Dear Anna, the report is ready.\n2) - added greeting", False,
+        (None, "Dear Anna, the report is ready.", ("added greeting",)),
+        id="subject-not-email",
+    ),
+    pytest.param(
+        'Subject Line - "Report ready"\n\nDear Anna, the report is ready.', True,
+        ("Report ready", "Dear Anna, the report is ready.", ()),
+        id="subject-line-quoted",
+    ),
+    pytest.param(
+        "Report ready\n\nDear Anna, the report is ready.", True,
+        ("Report ready", "Dear Anna, the report is ready.", ()),
+        id="subject-heuristic",
+    ),
+    pytest.param("Just a polished sentence.", False, (None, "Just a polished sentence.", ()), id="plain"),
+    pytest.param("", True, (None, "", ()), id="empty"),
+]
+
+
+@pytest.mark.parametrize("raw, is_email, expected", SAMPLES)
+def test_parse_text_matches_original_parser(raw, is_email, expected):
+    subject, polished, notes = parse_text(raw, is_email)
+    assert (subject, polished, tuple(notes)) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("a\nb\n2) c", ("a\nb", "\n2) c")),
+    ("a\n   Key edits: x\n2) y", ("a", "\n   Key edits: x\n2) y")),
+    ("a\n2.x\n- y", ("a", "\n2.x\n- y")),
+    ("a\n\t* b\n2) c", ("a", "\n\t* b\n2) c")),
+    ("a\nedit NOTES\n2)b", ("a", "\nedit NOTES\n2)b")),
+    ("a\n*bold* word", ("a\n*bold* word", "")),
+    ("no notes", ("no notes", "")),
+])
+def test_split_notes(text, expected):
+    assert split_notes(text) == expected
+
+
+def test_note_lines():
+    assert note_lines("\n2) - a\n(b) c\n\n* d") == ("a", "b) c", "d")
+    assert note_lines("") == ()
+
+
+def test_extract_subject_without_subject():
+    raw = "A longer first line that is clearly not a subject line here\n\nBody."
+    assert extract_subject(raw) == (None, raw)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", ""),
+    ("abc", "abc"),
+    ("  a b \n", "a b"),
+    ('  "hi"  ', "hi"),
+    ('""', ""),
+    ('"', '"'),
+    ('"Hello', '"Hello'),
+    ('"  spaced  "', "  spaced  "),
+])
+def test_normalize(text, expected):
+    assert normalize(text) == expected
+
+
+def test_parse_structured():
+    raw = '{"subject": " ", "polished_text": "x", "notes": [" a ", "", 3, "b"]}'
+    assert parse_structured(raw) == (None, "x", ["a", "b"])
+    assert parse_structured('{"subject": "Hi", "polished_text": "x"}') == ("Hi", "x", [])
+    assert parse_structured('{"polished_text": "cut off') is None
+    assert parse_structured('{"notes": []}') is None
+
+
+# ~50 kB inputs that made the original lazy/overlapping regexes backtrack
+# (400 blank lines alone took tens of seconds); each must parse in well under a second.
+PATHOLOGICAL = {
+    "blank-lines": "\n" * 50000,
+    "spaces": " " * 50000,
+    "mixed-whitespace": " \n\t" * 17000,
+    "repeated-one": "\n1)" * 17000,
+    "repeated-two": "\n2)" * 17000,
+    "repeated-bullets": "\n- " * 17000,
+    "heading-then-blank-lines": "Polished text:" + "\n" * 50000 + "x",
+    "indented-one": "1)" + " " * 50000 + "x",
+    "subject-then-spaces": "Subject" + " " * 50000,
+}
+
+
+@pytest.mark.parametrize("text", PATHOLOGICAL.values(), ids=PATHOLOGICAL.keys())
+def test_pathological_input_is_fast(text):
+    parse_polished_and_notes.cache_clear()
+    extract_subject.cache_clear()
+    start = time.perf_counter()
+    parse_text(text, True)
+    split_notes(text)
+    assert time.perf_counter() - start < 0.5
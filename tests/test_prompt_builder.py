@@ -0,0 +1,15 @@
+"""
+Tests for workpolish.prompt_builder.
+"""
+from workpolish.prompt_builder import CONTEXTS, EMAIL_CONTEXTS, build_prompt
+
+
+def test_email_contexts_are_selectable():
+    assert EMAIL_CONTEXTS
+    assert EMAIL_CONTEXTS <= set(CONTEXTS)
+
+
+def test_subject_requested_only_for_email_contexts():
+    for context in CONTEXTS:
+        prompt = build_prompt("hello", "More formal", context, False)
+        assert ("'Subject:'" in prompt) == (context in EMAIL_CONTEXTS)
@@ -0,0 +1,44 @@
+"""
+In-process cache for finished model outputs.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU map of request key -> model output, with a TTL.
+    A single instance is shared by every session of the app process.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (timestamp, value), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the cached value for key, or None if missing or expired.
+        """
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None:
+                return None
+            if time.time() - hit[0] >= self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return hit[1]
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
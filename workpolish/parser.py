@@ -0,0 +1,261 @@
+"""
+Output parsing for WorkPolish: the stage-2 JSON result and the text
+fallbacks for free-form model output.
+
+Kept out of app.py so compiled patterns and cached results survive
+Streamlit's per-interaction script reruns.
+"""
+import functools
+import json
+import re
+
+try:
+    import re2  # optional (google-re2): linear-time engine for _P_SUBJECT, the one regex on the Subject path
+except ImportError:
+    re2 = None
+
+
+def _compile_linear(pattern: str):
+    """
+    Compile with google-re2 when it is installed, otherwise with re
+    (also if re2 rejects the pattern).
+    Flags must be inline ("(?im)...") since re2.compile doesn't take re flags.
+    The other patterns here are short, anchored scans that don't need it.
+    """
+    if re2 is not None:
+        try:
+            return re2.compile(pattern)
+        except Exception:
+            pass
+    return re.compile(pattern)
+
+# ---- regex patterns (compiled once per process, at import) ----
+# Patterns that run over model output avoid unbounded quantifiers that can
+# overlap (e.g. \s* next to [\s\S]*?), which backtrack badly on long or
+# whitespace-heavy responses. Where a span is needed it is found with
+# str.find / a single-anchor search instead.
+_P_HEADING = re.compile(r"Polished text[:\-]?", re.I)
+_P_HEADING_END = re.compile(r"\n(?:Edit notes|Key edits|2[\)\.])", re.I)
+_P_SUBJECT = _compile_linear(r"(?im)^(?:Subject|Subject Line)\s*[:\-]\s*(.+)$")
+_SUBJECT_PREFIXES = ("subject line:", "subject line -", "subject:", "subject -")
+_P_SPLIT_TWO = re.compile(r"\n[ \t]*2[\)\.][ \t]*")
+_P_LEAD_ONE = re.compile(r"^\s*1[\)\.]\s*")
+# Start of a notes section (see split_notes): an optionally indented line that
+# starts with '2)', '2.', 'Edit notes', 'Key edits', or a '-' / '*' bullet.
+# Every branch begins with a different character, so a failed branch never
+# backtracks into another.
+_P_NOTE_LINE = re.compile(r"\n[ \t]*(?:[-\*](?:\s|$)|2[\)\.]|Edit notes|Key edits)", re.I)
+
+# Structured output requested from the second-stage formatting call
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "subject": {"type": "string", "nullable": True},
+        "polished_text": {"type": "string"},
+        "notes": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["polished_text"],
+}
+
+
+def normalize(s: str) -> str:
+    """
+    Strip surrounding whitespace and one pair of enclosing double quotes.
+    One index scan and at most one slice, instead of chained .strip() copies.
+    """
+    i, j = 0, len(s)
+    while i < j and s[i].isspace():
+        i += 1
+    while j > i and s[j - 1].isspace():
+        j -= 1
+    if j - i >= 2 and s[i] == '"' == s[j - 1]:
+        i, j = i + 1, j - 1
+    return s[i:j]
+
+def parse_structured(raw: str):
+    """
+    Parse a JSON response that follows RESPONSE_SCHEMA.
+    Returns (subject_or_None, polished_text, notes_list), or None if raw isn't valid JSON
+    (e.g. the output was cut off), so callers can fall back to the text parsers.
+    """
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("polished_text"), str):
+        return None
+    subject = data.get("subject")
+    if not isinstance(subject, str) or not subject.strip():
+        subject = None
+    notes = [n for n in (normalize(x) for x in data.get("notes") or [] if isinstance(x, str)) if n]
+    return subject, data["polished_text"], notes
+
+def note_lines(notes_raw: str) -> tuple[str, ...]:
+    """
+    Split a notes block into lines, dropping blank lines and leading
+    bullet/number markers ("- ", "* ", "2) ", "(a) " ...). Plain str methods, no regex.
+    """
+    if not notes_raw:
+        return ()
+    notes = []
+    for s in notes_raw.splitlines():
+        s = s.lstrip("-*•0123456789.)( \t").strip()
+        if s:
+            notes.append(s)
+    return tuple(notes)
+
+def _line_marker(text: str, num: str, start: int = 0) -> int:
+    """
+    Index of the first "<num>)" or "<num>." at or after start that begins a line
+    (optionally indented), or -1. Uses str.find and only looks back over the
+    indentation, so the scan stays linear in len(text).
+    """
+    best = -1
+    for marker in (num + ")", num + "."):
+        i = text.find(marker, start)
+        while i >= 0:
+            j = i - 1
+            while j >= 0 and text[j] in " \t\r\f\v":
+                j -= 1
+            if j < 0 or text[j] == "\n":
+                break
+            i = text.find(marker, i + 1)
+        if i >= 0 and (best < 0 or i < best):
+            best = i
+    return best
+
+def _fast_split(text: str):
+    """
+    Split the "1) ... 2) ..." layout requested in the prompt (also "1." / "2.")
+    using plain str.find instead of regex. Returns (polished_text, notes_tuple),
+    or None if the markers are not where we expect them.
+    """
+    idx1 = _line_marker(text, "1")
+    if idx1 < 0:
+        return None
+    idx2 = _line_marker(text, "2", idx1 + 2)
+    if idx2 < 0:
+        return None
+    polished = text[idx1 + 2:idx2].strip()
+    return polished, note_lines(text[idx2 + 2:])
+
+@functools.lru_cache(maxsize=64)
+def parse_polished_and_notes(raw: str) -> tuple[str, tuple[str, ...]]:
+    """
+    Try to split model output into polished_text and edit_notes.
+    Returns (polished_text, notes_tuple).
+    If not parseable, returns (raw, ()).
+    Cached: identical model output always parses the same way.
+    """
+    text = (raw or "").strip()
+
+    # Try common "1) ... 2) ..." layout
+    fast = _fast_split(text)
+    if fast is not None:
+        return fast
+
+    # Try headings like "Polished text:" then notes
+    m = _P_HEADING.search(text)
+    if m:
+        end = _P_HEADING_END.search(text, m.end())
+        if end:
+            polished = text[m.end():end.start()].strip()
+            notes_raw = text[end.end():]
+            if notes_raw[:1] in (":", "-"):
+                notes_raw = notes_raw[1:]
+            return polished, note_lines(notes_raw)
+
+    # Fallback: split by "2)"
+    parts = _P_SPLIT_TWO.split(text, maxsplit=1)
+    if len(parts) == 2:
+        first = _P_LEAD_ONE.sub("", parts[0]).strip()
+        return first, note_lines(parts[1])
+
+    # Nothing matched => return raw as polished_text
+    return text, ()
+
+def split_notes(text: str) -> tuple[str, str]:
+    """
+    Split text at the first line that looks like the start of edit notes.
+    Returns (before, notes_part); notes_part is "" when there is no such line.
+    One left-to-right pass: str.find for the usual "\n2)" / "\n2." markers,
+    then _P_NOTE_LINE only over the text before them.
+    """
+    hits = [i for i in (text.find("\n2)"), text.find("\n2.")) if i >= 0]
+    pos = min(hits) if hits else -1
+    # a heading or bullet can only win if it starts before the literal marker;
+    # the few extra characters let a match that straddles it complete
+    m = _P_NOTE_LINE.search(text, 0, pos + 16 if pos >= 0 else len(text))
+    if m and (pos < 0 or m.start() < pos):
+        pos = m.start()
+    if pos < 0:
+        return text, ""
+    return text[:pos], text[pos:]
+
+@functools.lru_cache(maxsize=64)
+def extract_subject(raw: str):
+    """
+    Extract a 'Subject:' line if present (case-insensitive).
+    Returns (subject_or_None, remaining_text).
+    """
+    if not raw:
+        return None, raw
+    # only scan for a Subject line when the word appears at all
+    if "subject" in raw.lower():
+        # 0) common case: the Subject line is the first line, no regex needed
+        first, _, rest = raw.partition("\n")
+        head = first[:16].lower()
+        for prefix in _SUBJECT_PREFIXES:
+            if head.startswith(prefix):
+                subject = normalize(first[len(prefix):])
+                if subject:
+                    return subject, rest.strip()
+                break
+
+        # 1) look for explicit 'Subject:' line
+        m = _P_SUBJECT.search(raw)
+        if m:
+            subject = normalize(m.group(1))
+            # remove only the first Subject line from the raw output
+            start, end = m.span()
+            remaining = (raw[:start] + raw[end:]).strip()
+            return subject, remaining
+
+    # 2) heuristic: if first line is short (<=8 words) and followed by blank line, treat as subject
+    lines = raw.strip().splitlines()
+    if len(lines) > 1 and len(lines[0].split()) <= 8 and lines[1].strip() == "":
+        subject = normalize(lines[0])
+        remaining = "\n".join(lines[2:]).strip()
+        return subject, remaining
+
+    return None, raw
+
+def parse_text(raw: str, want_subject: bool):
+    """
+    Fallback for when there is no stage-2 JSON: split free-form model output
+    with the text parsers above.
+    Returns (subject_or_None, polished_text, notes), the same shape as parse_structured.
+    """
+    subject = None
+    remaining = raw
+    if want_subject and raw:
+        subject, remaining = extract_subject(raw)
+
+    polished, notes = parse_polished_and_notes(remaining)
+
+    # notes can still trail the polished text (e.g. a bare bullet list) -> split them off
+    before, trailing = split_notes(polished or "")
+    if before := before.strip():
+        polished = before
+    if not notes and trailing:
+        notes = note_lines(trailing)
+
+    if not polished or not polished.strip():
+        # prefer the text without the subject, otherwise the raw output, minus any notes
+        source = remaining if remaining and remaining.strip() else raw
+        before, trailing = split_notes(source or "")
+        polished = before.strip()
+        if not notes and trailing:
+            notes = note_lines(trailing)
+
+    return subject, polished, notes
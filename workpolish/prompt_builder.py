@@ -0,0 +1,86 @@
+"""
+Prompt construction for WorkPolish.
+"""
+import functools
+import re
+
+_P_CHINESE = re.compile(r'[\u4e00-\u9fff]')
+
+# Context selectbox options; each label is written once so EMAIL_CONTEXTS can't drift
+_EMAIL_TO_MANAGER = "Email to manager"
+_EMAIL_TO_SELLER = "Email to online seller (e.g. Amazon)"
+CONTEXTS: tuple[str, ...] = (
+    _EMAIL_TO_MANAGER,
+    "Message to manager",
+    "Message to teammate",
+    _EMAIL_TO_SELLER,
+    "PPT text",
+    "Chat message",
+)
+# Contexts that get an email subject line
+EMAIL_CONTEXTS = frozenset({_EMAIL_TO_MANAGER, _EMAIL_TO_SELLER})
+
+# Constant instructions that open every polish prompt (keep byte-for-byte stable)
+_PROMPT_HEADER = (
+    "You are a professional workplace writing assistant. "
+    "Polish the text for clarity, tone, and conciseness while keeping the original meaning strictly unchanged.\n\n"
+    "- Respond in English.\n"
+    "- Do not invent new facts or add content not present in the original text.\n"
+    "- Apply the options listed after the original text.\n\n"
+)
+
+
+def contains_chinese(text: str) -> bool:
+    if not text:
+        return False
+    return bool(_P_CHINESE.search(text))
+
+@functools.lru_cache(maxsize=128)
+def build_prompt(text: str, tone: str, context: str, show_notes: bool, translate_to_english: bool=False) -> str:
+    """
+    If translate_to_english is True, instruct the model to first translate from Chinese to English,
+    then polish the English result to the requested tone/context.
+    Cached so repeat clicks reuse the same prompt string (and its hash) as the response-cache key.
+
+    Layout: the byte-identical _PROMPT_HEADER, then the original text, then every
+    per-request option in a trailing OPTIONS block, so Gemini's implicit prefix
+    cache can match the header no matter which tone/context is picked.
+    """
+    options = [
+        f"- Target tone: {tone}",
+        f"- Context: {context}",
+    ]
+    if translate_to_english:
+        options.append(
+            "- First translate the input (Chinese) into clear, natural English. "
+            "Then polish the translated English to match the requested tone and context."
+        )
+    # If email-like, ask for subject in English too
+    if context in EMAIL_CONTEXTS:
+        options.append(
+            "- Also produce a short email subject line (<= 8 words) prefixed by 'Subject:'. "
+            "Then provide the polished email body in English."
+        )
+    if show_notes:
+        options.append("Output format:\n1) Polished text (in English)\n2) 2-3 short bullet points describing key edits")
+    else:
+        options.append("Output format: Polished text only.")
+    return (
+        _PROMPT_HEADER
+        + "Original:\n\"\"\"\n" + text + "\n\"\"\"\n\n"
+        + "--- OPTIONS ---\n" + "\n".join(options) + "\n"
+    )
+
+def build_structure_prompt(raw: str) -> str:
+    """
+    Second-stage prompt: reformat the first model's free-form output into
+    RESPONSE_SCHEMA JSON without changing any wording.
+    """
+    return (
+        "Reformat the text below as JSON with keys polished_text, subject and notes. "
+        "Copy the wording exactly; do not rewrite, translate, or add anything.\n"
+        "- subject: the email subject line if one is present (without the 'Subject:' prefix), otherwise null.\n"
+        "- polished_text: the polished text itself, without any numbering, headings, subject line or notes.\n"
+        "- notes: the edit notes as a list of strings, without bullet markers; an empty list if there are none.\n\n"
+        "Text:\n\"\"\"\n" + raw + "\n\"\"\"\n"
+    )
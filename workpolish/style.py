@@ -0,0 +1,24 @@
+"""
+Stylesheet loading for the WorkPolish Streamlit app.
+"""
+import functools
+import os
+import re
+
+_P_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_P_CSS_SPACE = re.compile(r"\s*([{};,])\s*")
+_P_WHITESPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1)
+def load_css() -> str:
+    """
+    Read the app stylesheet once and return it minified and wrapped in a <style> tag.
+    Streamlit re-sends the block on every rerun, so keep it small.
+    """
+    with open(os.path.join(os.path.dirname(__file__), "style.css"), encoding="utf-8") as f:
+        css = f.read()
+    css = _P_CSS_COMMENT.sub("", css)
+    css = _P_CSS_SPACE.sub(r"\1", css)
+    css = _P_WHITESPACE.sub(" ", css).strip()
+    return "<style>" + css + "</style>"